@@ -0,0 +1,158 @@
+import argparse
+import logging
+
+from sqlalchemy import (
+    create_engine,
+    Column,
+    Integer,
+    String,
+    BigInteger,
+    UniqueConstraint,
+)
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from database import SessionLocal, VoterRecord, engine
+import config
+
+
+logger = logging.getLogger(__name__)
+
+ArchiveBase = declarative_base()
+
+
+class ArchivedVoterRecord(ArchiveBase):
+    __tablename__ = "archived_voter_records"
+    __table_args__ = (UniqueConstraint("election", "source_id"),)
+    id = Column(Integer, primary_key=True)
+    # voter_records.id reuses ids of deleted rows, so it is only unique per election.
+    source_id = Column(Integer, nullable=False)
+    user_id = Column(BigInteger, unique=False, index=True)
+    transaction_id = Column(String, nullable=False)
+    voter_key = Column(String, nullable=True)
+    region = Column(String, nullable=False)
+    election = Column(String, nullable=False, index=True)
+
+
+archive_engine = create_engine(config.ARCHIVE_DATABASE_URL)
+ArchiveSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=archive_engine
+)
+
+ArchiveBase.metadata.create_all(bind=archive_engine)
+
+_SQLITE_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def archive_election(
+    election: str, batch_size: int = config.ARCHIVE_BATCH_SIZE
+) -> int:
+    if election == config.CURRENT_ELECTION:
+        raise ValueError(f"Election {election} is still in progress")
+
+    n_archived = 0
+    while True:
+        with SessionLocal() as session:
+            with session.begin():
+                batch = (
+                    session.query(VoterRecord)
+                    .filter(VoterRecord.election == election)
+                    .order_by(VoterRecord.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not batch:
+                    break
+
+                # Upserting on (election, source_id) makes a batch repeated after
+                # a crash overwrite itself instead of duplicating.
+                with ArchiveSessionLocal() as archive_session:
+                    with archive_session.begin():
+                        already_archived = {
+                            archived.source_id: archived
+                            for archived in archive_session.query(ArchivedVoterRecord)
+                            .filter(
+                                ArchivedVoterRecord.election == election,
+                                ArchivedVoterRecord.source_id.in_(
+                                    [record.id for record in batch]
+                                ),
+                            )
+                            .all()
+                        }
+                        for record in batch:
+                            archived = already_archived.get(record.id)
+                            if archived is None:
+                                archived = ArchivedVoterRecord(
+                                    source_id=record.id, election=election
+                                )
+                                archive_session.add(archived)
+                            archived.user_id = record.user_id
+                            archived.transaction_id = record.transaction_id
+                            archived.voter_key = record.voter_key
+                            archived.region = record.region
+
+                session.query(VoterRecord).filter(
+                    VoterRecord.id.in_([record.id for record in batch])
+                ).delete(synchronize_session=False)
+
+        n_archived += len(batch)
+        logger.info(f"Archived {n_archived} records of election {election}")
+
+    return n_archived
+
+
+def compact_database(pages_per_step: int = config.COMPACTION_PAGES_PER_STEP) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        auto_vacuum = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        if auto_vacuum != _SQLITE_AUTO_VACUUM_INCREMENTAL:
+            # Switching modes needs one full VACUUM, afterwards compaction is online.
+            logger.info("Enabling incremental auto_vacuum with a full VACUUM")
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+            return
+
+        # pysqlite steps a statement without result columns only once, which
+        # frees a single page. executescript() runs it to completion.
+        sqlite_connection = conn.connection.driver_connection
+        while conn.exec_driver_sql("PRAGMA freelist_count").scalar():
+            sqlite_connection.executescript(
+                f"PRAGMA incremental_vacuum({pages_per_step});"
+            )
+        logger.info("Database compacted")
+
+
+def list_archived_records(
+    election: str | None = None, user_id: int | None = None
+) -> list[ArchivedVoterRecord]:
+    with ArchiveSessionLocal() as archive_session:
+        query = archive_session.query(ArchivedVoterRecord)
+        if election is not None:
+            query = query.filter(ArchivedVoterRecord.election == election)
+        if user_id is not None:
+            query = query.filter(ArchivedVoterRecord.user_id == user_id)
+        return query.order_by(ArchivedVoterRecord.id).all()
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Move voter records of a finished election to the archive "
+        "and compact the live database."
+    )
+    parser.add_argument("election", help="Election to archive, e.g. 2024-presidential")
+    args = parser.parse_args()
+
+    n_archived = archive_election(args.election)
+    logger.info(f"Archived {n_archived} records in total")
+    compact_database()
+
+
+if __name__ == "__main__":
+    main()
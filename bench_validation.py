@@ -0,0 +1,23 @@
+import timeit
+
+import validation
+
+
+def main() -> None:
+    samples = {
+        "moscow valid": (validation.normalize_moscow_sid, " 0x" + "AB" * 32 + "\n"),
+        "moscow invalid": (validation.normalize_moscow_sid, "not a transaction id"),
+        "federal valid": (
+            validation.normalize_other_transaction_id,
+            " 3N1mKpvHJtPq6Uq8ce4ZQ3MiHLxrbgWKsnC6JMGAVnSh\n",
+        ),
+        "oversized": (validation.normalize_moscow_sid, "a" * 10_000),
+    }
+    n_runs = 100_000
+    for name, (normalize, sample) in samples.items():
+        elapsed = timeit.timeit(lambda: normalize(sample), number=n_runs)
+        print(f"{name}: {elapsed / n_runs * 1e9:.0f} ns per call")
+
+
+if __name__ == "__main__":
+    main()
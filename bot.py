@@ -1,11 +1,15 @@
+import asyncio
+import contextlib
 import enum
 import logging
+import signal
 
 from telegram import (
     InlineKeyboardMarkup,
     Update,
     InlineKeyboardButton,
 )
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -14,10 +18,21 @@ from telegram.ext import (
     filters,
     ContextTypes,
     CallbackQueryHandler,
+    TypeHandler,
+    ApplicationHandlerStop,
 )
 
-from database import SessionLocal, VoterRecord
+from database import (
+    ReadSessionLocal,
+    SessionLocal,
+    VoterRecord,
+    engine,
+    read_engine,
+    load_update_checkpoint,
+    save_update_checkpoint,
+)
 import config
+import validation
 
 
 logger = logging.getLogger(__name__)
@@ -33,7 +48,6 @@ logging.basicConfig(
 (
     MENU_CHOICE,
     LISTED_TX_FOR_VERIFICATION,
-    REMOVE_TX_REQUESTED_INPUT,
     REMOVE_TX_REQUESTED_CONFIRMATION,
     REGION,
     READY_TO_SEND_TX,
@@ -42,7 +56,7 @@ logging.basicConfig(
     OTHER_VOTER_KEY,
     CONFIRMATION,
     CONFIRMATION_RESPONSE_HANDLER,
-) = range(11)
+) = range(10)
 
 
 async def menu(
@@ -97,74 +111,86 @@ def _format_voting_record(record: VoterRecord, tx_number: int) -> str:
     return message
 
 
+def _load_records_page(
+    user_id: int, cursor: int, forward: bool
+) -> tuple[list[VoterRecord], bool]:
+    # Keyset pagination: every page is an index range scan right after (or
+    # before) the cursor record, whatever the number of records of the user.
+    with ReadSessionLocal() as session:
+        records_query = session.query(VoterRecord).filter(
+            VoterRecord.user_id == user_id,
+            VoterRecord.election == config.CURRENT_ELECTION,
+        )
+        if forward:
+            records_query = records_query.filter(VoterRecord.id > cursor).order_by(
+                VoterRecord.id
+            )
+        else:
+            records_query = records_query.filter(VoterRecord.id < cursor).order_by(
+                VoterRecord.id.desc()
+            )
+        records = records_query.limit(config.RECORDS_PER_PAGE + 1).all()
+
+    has_more = len(records) > config.RECORDS_PER_PAGE
+    records = records[: config.RECORDS_PER_PAGE]
+    if not forward:
+        records.reverse()
+    return records, has_more
+
+
 async def list_tx_for_verification(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
 ) -> int:
-    assert context.user_data is not None
-
     query = update.callback_query
     assert query is not None
     assert query.message is not None
+    assert query.data is not None
 
-    with SessionLocal() as session:
-        all_this_user_records = (
-            session.query(VoterRecord)
-            .filter(VoterRecord.user_id == query.from_user.id)
-            .all()
-        )
+    # Either the menu button, or `list_{next,prev}_<cursor id>_<records before page>`.
+    forward, cursor, offset = True, 0, 0
+    if query.data != "list_tx_for_verification":
+        _, direction, cursor_str, offset_str = query.data.split("_")
+        forward, cursor, offset = direction == "next", int(cursor_str), int(offset_str)
+
+    records, has_more = _load_records_page(query.from_user.id, cursor, forward)
+    if not records and offset > 0:
+        # The page was emptied by deletions, start over.
+        forward, cursor, offset = True, 0, 0
+        records, has_more = _load_records_page(query.from_user.id, cursor, forward)
 
     await query.answer()
 
-    n_records = len(all_this_user_records)
-    if n_records == 0:
+    if not records:
         await query.message.reply_text("У вас пока нет транзакций для проверки.")
         return await menu(update, context, force_new_message=True)
 
-    message = f"Текущие транзакции для проверки: {n_records}.\n\n"
-
-    for i, record in enumerate(all_this_user_records, 1):
-        message += _format_voting_record(record, i) + "\n"
-
-    message += "Хотите удалить некоторые транзакции из мониторинга?"
-
-    context.user_data["tx_for_removal"] = {
-        i: record.id for i, record in enumerate(all_this_user_records, 1)
-    }
-
-    await query.edit_message_text(
-        message.strip(),
-        reply_markup=InlineKeyboardMarkup(
-            [
-                [InlineKeyboardButton("Да", callback_data="remove_tx")],
-                [InlineKeyboardButton("Нет, вернуться в меню", callback_data="menu")],
-            ]
-        ),
+    if forward:
+        has_next, has_prev = has_more, offset > 0
+    else:
+        # A backward page ends right before the cursor record.
+        has_next, has_prev = True, has_more
+        offset = max(offset - len(records), 0)
+    if not has_prev:
+        offset = 0
+
+    message = (
+        f"Текущие транзакции для проверки: {offset + 1}–{offset + len(records)}.\n\n"
     )
+    for tx_number, record in enumerate(records, offset + 1):
+        message += _format_voting_record(record, tx_number) + "\n"
 
-    return LISTED_TX_FOR_VERIFICATION
-
-
-async def remove_tx_request_input(
-    update: Update,
-    context: ContextTypes.DEFAULT_TYPE,
-) -> int:
-    assert context.user_data is not None
-    query = update.callback_query
-    assert query is not None
-    assert query.message is not None
-
-    tx_for_removal = context.user_data["tx_for_removal"]
-
-    await query.answer()
-
-    await query.edit_message_reply_markup(reply_markup=None)
+    message += "Нажмите на номер транзакции, чтобы удалить ее из мониторинга."
 
-    all_keyboard_buttons = []
-    for tx_number in tx_for_removal.keys():
-        all_keyboard_buttons.append(
-            InlineKeyboardButton(f"{tx_number}", callback_data=f"delete_{tx_number}")
+    # Lets the delete confirmation return to this very page.
+    page_cursor = records[0].id - 1
+    all_keyboard_buttons = [
+        InlineKeyboardButton(
+            f"{tx_number}",
+            callback_data=f"delete_{record.id}_{tx_number}_{page_cursor}_{offset}",
         )
+        for tx_number, record in enumerate(records, offset + 1)
+    ]
 
     organized_keyboard_buttons = []
     for batch_start in range(0, len(all_keyboard_buttons), 3):
@@ -172,41 +198,70 @@ async def remove_tx_request_input(
             all_keyboard_buttons[batch_start : batch_start + 3]
         )
 
+    navigation_buttons = []
+    if has_prev:
+        navigation_buttons.append(
+            InlineKeyboardButton(
+                "« Назад",
+                callback_data=f"list_prev_{records[0].id}_{offset}",
+            )
+        )
+    if has_next:
+        navigation_buttons.append(
+            InlineKeyboardButton(
+                "Вперед »",
+                callback_data=f"list_next_{records[-1].id}_{offset + len(records)}",
+            )
+        )
+    if navigation_buttons:
+        organized_keyboard_buttons.append(navigation_buttons)
+
     organized_keyboard_buttons.append(
-        [
-            InlineKeyboardButton("Вернуться назад", callback_data="back"),
-        ]
+        [InlineKeyboardButton("Вернуться в меню", callback_data="menu")]
     )
 
-    await query.message.reply_text(
-        "Какую транзакцию вы хотите удалить?",
+    await query.edit_message_text(
+        message.strip(),
         reply_markup=InlineKeyboardMarkup(organized_keyboard_buttons),
     )
 
-    return REMOVE_TX_REQUESTED_INPUT
+    return LISTED_TX_FOR_VERIFICATION
+
+
+def _parse_callback_numbers(data: str | None) -> list[int]:
+    # `<action>_<number>_<number>...`
+    assert data is not None
+    return [int(part) for part in data.split("_")[1:]]
 
 
 async def remove_tx_request_confirmation(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
-    assert context.user_data is not None
     query = update.callback_query
     assert query is not None
     assert query.message is not None
     await query.answer()
 
-    tx_to_delete = query.data
-    assert isinstance(tx_to_delete, str) and tx_to_delete.startswith("delete_")
-    tx_number_to_delete = int(tx_to_delete.split("_")[1])
-
-    context.user_data["deleting_tx"] = tx_number_to_delete
+    (
+        record_id,
+        tx_number_to_delete,
+        page_cursor,
+        page_offset,
+    ) = _parse_callback_numbers(query.data)
 
-    tx_for_removal = context.user_data["tx_for_removal"]
-    tx_id_for_removal = tx_for_removal[tx_number_to_delete]
+    with ReadSessionLocal() as session:
+        tx_to_delete = (
+            session.query(VoterRecord)
+            .filter(
+                VoterRecord.id == record_id,
+                VoterRecord.user_id == query.from_user.id,
+            )
+            .one_or_none()
+        )
 
-    with SessionLocal() as session:
-        tx_to_delete = session.query(VoterRecord).get(tx_id_for_removal)
-        assert tx_to_delete is not None
+    if tx_to_delete is None:
+        await query.edit_message_text("Эта транзакция уже удалена.", reply_markup=None)
+        return await menu(update, context, force_new_message=True)
 
     message = "Готовы удалить транзакцию:\n"
     message += _format_voting_record(tx_to_delete, tx_number_to_delete) + "\n"
@@ -218,8 +273,14 @@ async def remove_tx_request_confirmation(
         reply_markup=InlineKeyboardMarkup(
             [
                 [
-                    InlineKeyboardButton("Да", callback_data="yes"),
-                    InlineKeyboardButton("Нет, вернуться назад", callback_data="no"),
+                    InlineKeyboardButton(
+                        "Да",
+                        callback_data=f"yes_{record_id}_{tx_number_to_delete}",
+                    ),
+                    InlineKeyboardButton(
+                        "Нет, вернуться назад",
+                        callback_data=f"list_next_{page_cursor}_{page_offset}",
+                    ),
                 ]
             ]
         ),
@@ -229,20 +290,18 @@ async def remove_tx_request_confirmation(
 
 
 async def remove_tx(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    assert context.user_data is not None
     query = update.callback_query
     assert query is not None
     assert query.message is not None
 
-    tx_for_removal = context.user_data["tx_for_removal"]
-    tx_number_to_delete = context.user_data["deleting_tx"]
-    tx_id_for_removal = tx_for_removal[tx_number_to_delete]
+    record_id, tx_number_to_delete = _parse_callback_numbers(query.data)
 
     with SessionLocal() as session:
         with session.begin():
-            tx_to_delete = session.query(VoterRecord).get(tx_id_for_removal)
-            if tx_to_delete:
-                session.delete(tx_to_delete)
+            session.query(VoterRecord).filter(
+                VoterRecord.id == record_id,
+                VoterRecord.user_id == query.from_user.id,
+            ).delete(synchronize_session=False)
 
     await query.answer()
 
@@ -262,10 +321,13 @@ async def start_record_tx(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     assert query is not None
     assert query.message is not None
 
-    with SessionLocal() as session:
+    with ReadSessionLocal() as session:
         n_existing_records = (
             session.query(VoterRecord)
-            .filter(VoterRecord.user_id == update.effective_user.id)
+            .filter(
+                VoterRecord.user_id == update.effective_user.id,
+                VoterRecord.election == config.CURRENT_ELECTION,
+            )
             .count()
         )
 
@@ -384,7 +446,13 @@ async def moscow_transaction_id(
     assert update.message is not None
     assert update.message.text is not None
     assert context.user_data is not None
-    transaction_id = update.message.text
+    transaction_id = validation.normalize_moscow_sid(update.message.text)
+    if transaction_id is None:
+        await update.message.reply_text(
+            "Это не похоже на SID: он должен состоять из 64 символов 0-9 и a-f. "
+            "Пожалуйста, отправьте SID еще раз."
+        )
+        return MOSCOW_TRANSACTION_ID
 
     context.user_data["transaction_id"] = transaction_id
     return await confirmation(update, context)
@@ -396,7 +464,15 @@ async def other_transaction_id(
     assert update.message is not None
     assert update.message.text is not None
     assert context.user_data is not None
-    transaction_id = update.message.text
+    transaction_id = validation.normalize_other_transaction_id(update.message.text)
+    if transaction_id is None:
+        await update.message.reply_text(
+            "Это не похоже на ID транзакции: он должен состоять из 32-44 латинских "
+            "букв и цифр без 0, O, I и l. "
+            "Пожалуйста, отправьте ID транзакции еще раз."
+        )
+        return OTHER_TRANSACTION_ID
+
     context.user_data["transaction_id"] = transaction_id
     await update.message.reply_text(
         "Теперь, пожалуйста, предоставьте ваш публичный ключ голосующего в ответе."
@@ -408,7 +484,15 @@ async def other_voter_key(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     assert update.message is not None
     assert update.message.text is not None
     assert context.user_data is not None
-    voter_key = update.message.text
+    voter_key = validation.normalize_other_voter_key(update.message.text)
+    if voter_key is None:
+        await update.message.reply_text(
+            "Это не похоже на ключ голосующего: он должен состоять из латинских "
+            "букв и цифр без 0, O, I и l. "
+            "Пожалуйста, отправьте ключ еще раз."
+        )
+        return OTHER_VOTER_KEY
+
     context.user_data["voter_key"] = voter_key
     return await confirmation(update, context)
 
@@ -511,18 +595,127 @@ async def save_voter_record(update: Update, context: ContextTypes.DEFAULT_TYPE)
         transaction_id=transaction_id,
         voter_key=voter_key,
         region=region.value,
+        election=config.CURRENT_ELECTION,
     )
 
     with SessionLocal() as session:
         with session.begin():
-            logging.info(f"Persisting voter record: {new_record}")
-            session.add(new_record)
+            already_tracked = (
+                session.query(VoterRecord)
+                .filter(
+                    VoterRecord.user_id == update.effective_user.id,
+                    VoterRecord.election == config.CURRENT_ELECTION,
+                    VoterRecord.transaction_id == transaction_id,
+                )
+                .count()
+            )
+            if not already_tracked:
+                logging.info(f"Persisting voter record: {new_record}")
+                session.add(new_record)
+
+    if already_tracked:
+        await query.message.reply_text("Эта транзакция уже отслеживается.")
+        return
 
     await query.message.reply_text("Спасибо! Ваши данные были записаны.")
 
 
+async def skip_processed_update(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    last_update_id = context.bot_data.get("last_update_id")
+    if last_update_id is not None and update.update_id <= last_update_id:
+        logger.info(f"Skipping already processed update {update.update_id}")
+        raise ApplicationHandlerStop
+
+
+async def checkpoint_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    save_update_checkpoint(update.update_id)
+    context.bot_data["last_update_id"] = update.update_id
+
+
+async def resume_from_checkpoint(application: Application) -> None:
+    last_update_id = load_update_checkpoint()
+    application.bot_data["last_update_id"] = last_update_id
+    if last_update_id is not None:
+        logger.info(f"Resuming after update {last_update_id}")
+
+
+async def poll_updates(application: Application, stop_requested: asyncio.Event) -> None:
+    # Unlike Updater, which confirms updates to Telegram as soon as they are
+    # fetched, an update is only confirmed (by asking for a higher offset) after
+    # it was handled. Anything not handled before a restart is redelivered.
+    last_update_id = application.bot_data.get("last_update_id")
+    offset = None if last_update_id is None else last_update_id + 1
+
+    while not stop_requested.is_set():
+        fetch = asyncio.create_task(
+            application.bot.get_updates(
+                offset=offset,
+                timeout=config.POLLING_TIMEOUT_SECONDS,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        )
+        stop = asyncio.create_task(stop_requested.wait())
+        await asyncio.wait({fetch, stop}, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if not fetch.done():
+            fetch.cancel()
+            return
+
+        try:
+            updates = fetch.result()
+        except TelegramError as e:
+            logger.warning(f"Failed to fetch updates: {e}")
+            await asyncio.sleep(config.POLLING_RETRY_DELAY_SECONDS)
+            continue
+
+        for update in updates:
+            if stop_requested.is_set():
+                return
+            await application.process_update(update)
+            offset = update.update_id + 1
+
+
+async def run(application: Application) -> None:
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(stop_signal, stop_requested.set)
+
+    await application.initialize()
+    try:
+        await resume_from_checkpoint(application)
+        await application.start()
+        polling = asyncio.create_task(poll_updates(application, stop_requested))
+        polling.add_done_callback(lambda _: stop_requested.set())
+
+        await stop_requested.wait()
+
+        # The poller stops fetching right away and finishes the update it handles.
+        done, _ = await asyncio.wait(
+            {polling}, timeout=config.SHUTDOWN_DRAIN_TIMEOUT_SECONDS
+        )
+        if not done:
+            logger.warning(
+                f"Could not drain updates in {config.SHUTDOWN_DRAIN_TIMEOUT_SECONDS}s, "
+                f"updates after {application.bot_data.get('last_update_id')} "
+                "will be redelivered"
+            )
+            polling.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await polling
+    finally:
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        engine.dispose()
+        read_engine.dispose()
+
+
 def main() -> None:
-    application = Application.builder().token(config.BOT_TOKEN).build()
+    # Updates are fetched by poll_updates() instead of the built-in Updater.
+    application = Application.builder().token(config.BOT_TOKEN).updater(None).build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", menu), CommandHandler("menu", menu)],
@@ -537,17 +730,18 @@ def main() -> None:
             ],
             LISTED_TX_FOR_VERIFICATION: [
                 CallbackQueryHandler(menu, pattern="^menu$"),
-                CallbackQueryHandler(remove_tx_request_input, pattern="^remove_tx$"),
-            ],
-            REMOVE_TX_REQUESTED_INPUT: [
-                CallbackQueryHandler(menu, pattern="^back$"),
                 CallbackQueryHandler(
-                    remove_tx_request_confirmation, pattern=r"^delete_\d+$"
+                    list_tx_for_verification, pattern=r"^list_(next|prev)_\d+_\d+$"
+                ),
+                CallbackQueryHandler(
+                    remove_tx_request_confirmation, pattern=r"^delete_\d+_\d+_\d+_\d+$"
                 ),
             ],
             REMOVE_TX_REQUESTED_CONFIRMATION: [
-                CallbackQueryHandler(remove_tx, pattern="^yes$"),
-                CallbackQueryHandler(remove_tx_request_input, pattern="^no$"),
+                CallbackQueryHandler(remove_tx, pattern=r"^yes_\d+_\d+$"),
+                CallbackQueryHandler(
+                    list_tx_for_verification, pattern=r"^list_next_\d+_\d+$"
+                ),
             ],
             REGION: [
                 CallbackQueryHandler(region, pattern="^(moscow|other)$"),
@@ -577,9 +771,11 @@ def main() -> None:
         fallbacks=[CommandHandler("cancel", menu)],
     )
 
+    application.add_handler(TypeHandler(Update, skip_processed_update), group=-1)
     application.add_handler(conv_handler)
+    application.add_handler(TypeHandler(Update, checkpoint_update), group=1)
 
-    application.run_polling()
+    asyncio.run(run(application))
 
 
 if __name__ == "__main__":
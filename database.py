@@ -1,6 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, BigInteger
+from sqlalchemy import (
+    create_engine,
+    event,
+    inspect,
+    text,
+    Column,
+    Index,
+    Integer,
+    String,
+    BigInteger,
+)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 import config
 
@@ -9,14 +21,125 @@ Base = declarative_base()
 
 class VoterRecord(Base):
     __tablename__ = "voter_records"
+    # SQLite appends the rowid (id) to the index, which covers the keyset
+    # pagination over (user_id, election, id) in bot.py.
+    __table_args__ = (Index("ix_voter_records_user_id_election", "user_id", "election"),)
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, unique=False)
     transaction_id = Column(String, nullable=False)
     voter_key = Column(String, nullable=True)
     region = Column(String, nullable=False)
+    election = Column(String, nullable=False, index=True)
 
 
-engine = create_engine(config.DATABASE_URL)
+class UpdateCheckpoint(Base):
+    __tablename__ = "update_checkpoints"
+    name = Column(String, primary_key=True)
+    last_update_id = Column(BigInteger, nullable=False)
+
+
+_connect_args = {}
+if make_url(config.DATABASE_URL).get_backend_name() == "sqlite":
+    # Pooled connections move between threads. SQLAlchemy 2.0 turns the pysqlite
+    # same-thread check off by itself, 1.4 does not.
+    _connect_args["check_same_thread"] = False
+
+# All writes go through a single connection so they are serialized in the
+# application instead of fighting over the SQLite lock. Reads use their own pool
+# and, thanks to WAL, are not blocked by the writer.
+engine = create_engine(
+    config.DATABASE_URL,
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=config.DATABASE_LOCK_TIMEOUT_SECONDS,
+    connect_args=_connect_args,
+)
+read_engine = create_engine(
+    config.DATABASE_URL,
+    poolclass=QueuePool,
+    pool_size=config.DATABASE_READ_POOL_SIZE,
+    max_overflow=0,
+    connect_args=_connect_args,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        del connection_record
+        cursor = dbapi_connection.cursor()
+        # Only takes effect on a fresh database, archive.compact_database()
+        # converts existing ones.
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        # NORMAL could lose the last commits on power loss, including checkpoints
+        # of updates already confirmed to Telegram.
+        cursor.execute("PRAGMA synchronous = FULL")
+        cursor.execute(
+            f"PRAGMA busy_timeout = {config.DATABASE_LOCK_TIMEOUT_SECONDS * 1000}"
+        )
+        cursor.close()
+
+    @event.listens_for(read_engine, "connect")
+    def _set_sqlite_read_pragmas(dbapi_connection, connection_record) -> None:
+        del connection_record
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only = ON")
+        # WAL readers can still briefly hit a lock, e.g. during WAL recovery or
+        # a checkpoint by archive.py running in another process.
+        cursor.execute(
+            f"PRAGMA busy_timeout = {config.DATABASE_LOCK_TIMEOUT_SECONDS * 1000}"
+        )
+        cursor.close()
+
+
+def _add_election_column() -> None:
+    columns = inspect(engine).get_columns(VoterRecord.__tablename__)
+    if any(column["name"] == "election" for column in columns):
+        return
+
+    # Records created before the column existed belong to the current election.
+    # DDL does not accept bound parameters, the value comes from config.
+    default_election = config.CURRENT_ELECTION.replace("'", "''")
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                f"ALTER TABLE {VoterRecord.__tablename__} "
+                f"ADD COLUMN election VARCHAR NOT NULL DEFAULT '{default_election}'"
+            )
+        )
+
+
+def _create_missing_indexes() -> None:
+    # create_all() skips indexes of tables that already exist.
+    for index in VoterRecord.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
 
 Base.metadata.create_all(bind=engine)
+_add_election_column()
+_create_missing_indexes()
+
+
+POLLING_CHECKPOINT = "polling"
+
+
+def load_update_checkpoint(name: str = POLLING_CHECKPOINT) -> int | None:
+    with ReadSessionLocal() as session:
+        checkpoint = session.get(UpdateCheckpoint, name)
+        if checkpoint is None:
+            return None
+        return checkpoint.last_update_id
+
+
+def save_update_checkpoint(update_id: int, name: str = POLLING_CHECKPOINT) -> None:
+    with SessionLocal() as session:
+        with session.begin():
+            checkpoint = session.get(UpdateCheckpoint, name)
+            if checkpoint is None:
+                session.add(UpdateCheckpoint(name=name, last_update_id=update_id))
+            elif checkpoint.last_update_id < update_id:
+                checkpoint.last_update_id = update_id
@@ -0,0 +1,31 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CHECK_SID_BOT_TOKEN", "test-token")
+
+from sqlalchemy.engine import Engine  # noqa: E402
+
+# Modules that open their databases at import time, dependents first.
+_DATABASE_MODULES = ("bot", "archive", "database")
+
+
+@pytest.fixture
+def import_fresh(tmp_path, monkeypatch):
+    # The databases are opened at import, at paths relative to the working dir.
+    monkeypatch.chdir(tmp_path)
+    for name in _DATABASE_MODULES:
+        sys.modules.pop(name, None)
+
+    yield importlib.import_module
+
+    for name in _DATABASE_MODULES:
+        module = sys.modules.pop(name, None)
+        if module is None:
+            continue
+        for value in vars(module).values():
+            if isinstance(value, Engine):
+                value.dispose()
@@ -0,0 +1,129 @@
+import math
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+import config
+
+PAGES_PER_STEP = 64
+
+
+@pytest.fixture
+def database(import_fresh, monkeypatch):
+    monkeypatch.setattr(config, "CURRENT_ELECTION", "current")
+    return import_fresh("database")
+
+
+@pytest.fixture
+def archive(database, import_fresh):
+    return import_fresh("archive")
+
+
+def _add_records(database, election: str, n_records: int, payload: int = 10) -> None:
+    with database.SessionLocal() as session:
+        with session.begin():
+            session.add_all(
+                [
+                    database.VoterRecord(
+                        user_id=i % 3,
+                        transaction_id=f"{election}-{i}".ljust(payload, "x"),
+                        region="moscow",
+                        election=election,
+                    )
+                    for i in range(n_records)
+                ]
+            )
+
+
+def _freelist_count(database) -> int:
+    with database.engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+
+def test_archiving_reused_ids_keeps_both_elections(database, archive):
+    _add_records(database, "first", 30)
+    assert archive.archive_election("first", batch_size=7) == 30
+
+    # The live table is empty now, so SQLite hands out the same ids again.
+    _add_records(database, "second", 30)
+    assert archive.archive_election("second", batch_size=7) == 30
+
+    first = archive.list_archived_records("first")
+    second = archive.list_archived_records("second")
+    assert [record.source_id for record in first] == [
+        record.source_id for record in second
+    ]
+    assert {record.transaction_id[:6] for record in first} == {"first-"}
+    assert {record.transaction_id[:7] for record in second} == {"second-"}
+
+
+def test_archiving_again_is_a_noop(database, archive):
+    _add_records(database, "finished", 10)
+    _add_records(database, "current", 3)
+
+    assert archive.archive_election("finished") == 10
+    assert archive.archive_election("finished") == 0
+
+    assert len(archive.list_archived_records("finished")) == 10
+    with database.ReadSessionLocal() as session:
+        assert session.query(database.VoterRecord).count() == 3
+
+
+def test_current_election_cannot_be_archived(archive):
+    with pytest.raises(ValueError):
+        archive.archive_election("current")
+
+
+def test_compaction_converts_and_empties_legacy_database(
+    import_fresh, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(config, "CURRENT_ELECTION", "current")
+    # A database as created before archival existed: no election column and
+    # no incremental auto_vacuum.
+    with sqlite3.connect(tmp_path / "mydatabase.db") as connection:
+        connection.execute(
+            "CREATE TABLE voter_records (id INTEGER PRIMARY KEY, user_id BIGINT, "
+            "transaction_id VARCHAR NOT NULL, voter_key VARCHAR, "
+            "region VARCHAR NOT NULL)"
+        )
+        connection.executemany(
+            "INSERT INTO voter_records (user_id, transaction_id, region) "
+            "VALUES (?, ?, ?)",
+            [(i, f"{i}".ljust(1000, "x"), "moscow") for i in range(500)],
+        )
+
+    database = import_fresh("database")
+    archive = import_fresh("archive")
+    with database.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 0
+
+    monkeypatch.setattr(config, "CURRENT_ELECTION", "next")
+    assert archive.archive_election("current") == 500
+    archive.compact_database(PAGES_PER_STEP)
+
+    with database.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+    assert _freelist_count(database) == 0
+
+    # From now on compaction is incremental and frees PAGES_PER_STEP per step.
+    _add_records(database, "next", 500, payload=1000)
+    with database.SessionLocal() as session:
+        with session.begin():
+            session.query(database.VoterRecord).delete()
+    n_free_pages = _freelist_count(database)
+    assert n_free_pages > PAGES_PER_STEP
+
+    n_freelist_checks = 0
+
+    def count_freelist_checks(conn, cursor, statement, *args) -> None:
+        nonlocal n_freelist_checks
+        if "freelist_count" in statement:
+            n_freelist_checks += 1
+
+    event.listen(database.engine, "before_cursor_execute", count_freelist_checks)
+    archive.compact_database(PAGES_PER_STEP)
+    event.remove(database.engine, "before_cursor_execute", count_freelist_checks)
+
+    assert _freelist_count(database) == 0
+    assert n_freelist_checks <= math.ceil(n_free_pages / PAGES_PER_STEP) + 1
@@ -0,0 +1,73 @@
+import statistics
+import threading
+import time
+
+import pytest
+from sqlalchemy import insert
+
+N_IDLE_READS = 300
+N_WRITE_BURSTS = 3
+# Big enough to spill SQLite's page cache, after which a rollback journal writer
+# holds an exclusive lock until it commits.
+WRITE_BURST_SIZE = 20000
+WRITE_BURST_HOLD_SECONDS = 0.1
+# Reads are spread evenly over the bursts instead of piling up between them.
+READ_INTERVAL_SECONDS = 0.005
+# Without WAL a reader waits for the writer's lock, i.e. for a good part of a
+# burst. With WAL only thread scheduling is left.
+MAX_P95_SLOWDOWN_SECONDS = 0.05
+
+
+@pytest.fixture
+def database(import_fresh):
+    return import_fresh("database")
+
+
+def _read_latency(database) -> float:
+    start = time.perf_counter()
+    with database.ReadSessionLocal() as session:
+        session.query(database.VoterRecord).filter(
+            database.VoterRecord.user_id == 1
+        ).limit(10).all()
+    return time.perf_counter() - start
+
+
+def _p95(latencies: list[float]) -> float:
+    return statistics.quantiles(latencies, n=20)[-1]
+
+
+def test_read_latency_stays_flat_during_write_bursts(database):
+    with database.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    idle_p95 = _p95([_read_latency(database) for _ in range(N_IDLE_READS)])
+
+    rows = [
+        {
+            "user_id": i % 10,
+            "transaction_id": f"{i:064x}",
+            "region": "moscow",
+            "election": "test",
+        }
+        for i in range(WRITE_BURST_SIZE)
+    ]
+
+    def write_bursts() -> None:
+        for _ in range(N_WRITE_BURSTS):
+            with database.SessionLocal() as session:
+                with session.begin():
+                    session.execute(insert(database.VoterRecord), rows)
+                    time.sleep(WRITE_BURST_HOLD_SECONDS)
+
+    writer = threading.Thread(target=write_bursts)
+    writer.start()
+    loaded_latencies = []
+    while writer.is_alive():
+        loaded_latencies.append(_read_latency(database))
+        time.sleep(READ_INTERVAL_SECONDS)
+    writer.join()
+
+    with database.ReadSessionLocal() as session:
+        n_written = session.query(database.VoterRecord).count()
+    assert n_written == N_WRITE_BURSTS * WRITE_BURST_SIZE
+    assert _p95(loaded_latencies) < idle_p95 + MAX_P95_SLOWDOWN_SECONDS
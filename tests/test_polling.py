@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from telegram import Update
+from telegram.ext import Application, ExtBot, TypeHandler
+
+
+class StubBot(ExtBot):
+    def __init__(self, batches: list[list[int]]) -> None:
+        super().__init__("1:stub-token")
+        # Bots are frozen, only protected attributes can be set.
+        self._batches = batches
+        self._requested_offsets: list[int | None] = []
+
+    @property
+    def requested_offsets(self) -> list[int | None]:
+        return self._requested_offsets
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def get_updates(self, offset=None, **kwargs) -> list[Update]:
+        self._requested_offsets.append(offset)
+        if not self._batches:
+            # Long polling with nothing to deliver.
+            await asyncio.Event().wait()
+        return [Update(update_id) for update_id in self._batches.pop(0)]
+
+
+@pytest.fixture
+def bot(import_fresh):
+    return import_fresh("bot")
+
+
+async def _poll(bot, stub: StubBot, stop_after: int) -> list[int]:
+    handled = []
+    stop_requested = asyncio.Event()
+
+    async def handle(update: Update, context) -> None:
+        handled.append(update.update_id)
+        if update.update_id == stop_after:
+            stop_requested.set()
+
+    # Same wiring as bot.main(), with the conversation replaced by `handle`.
+    application = Application.builder().bot(stub).updater(None).build()
+    application.add_handler(TypeHandler(Update, bot.skip_processed_update), group=-1)
+    application.add_handler(TypeHandler(Update, handle))
+    application.add_handler(TypeHandler(Update, bot.checkpoint_update), group=1)
+
+    await application.initialize()
+    await bot.resume_from_checkpoint(application)
+    await asyncio.wait_for(bot.poll_updates(application, stop_requested), timeout=5)
+    await application.shutdown()
+    return handled
+
+
+def test_restart_resumes_after_last_handled_update(bot):
+    # Shutdown is requested while update 2 is handled, update 3 stays unhandled.
+    first_run = StubBot([[1, 2, 3]])
+    assert asyncio.run(_poll(bot, first_run, stop_after=2)) == [1, 2]
+    assert first_run.requested_offsets == [None]
+    assert bot.load_update_checkpoint() == 2
+
+    # Telegram redelivers update 2 anyway, it must not be handled twice.
+    second_run = StubBot([[2, 3, 4]])
+    assert asyncio.run(_poll(bot, second_run, stop_after=4)) == [3, 4]
+    assert second_run.requested_offsets == [3]
+    assert bot.load_update_checkpoint() == 4
+
+
+def test_next_batch_is_requested_after_handled_updates(bot):
+    stub = StubBot([[5, 6], [7]])
+    assert asyncio.run(_poll(bot, stub, stop_after=7)) == [5, 6, 7]
+    assert stub.requested_offsets == [None, 7]
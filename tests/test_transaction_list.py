@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+import config
+
+USER_ID = 1
+
+
+class StubQuery:
+    def __init__(self, data: str) -> None:
+        self.data = data
+        self.from_user = type("StubUser", (), {"id": USER_ID})()
+        self.message = self
+        self.edited_text = ""
+        self.buttons: list[list[str]] = []
+
+    async def answer(self) -> None:
+        pass
+
+    async def edit_message_text(self, text, reply_markup=None) -> None:
+        self.edited_text = text
+        if reply_markup is not None:
+            self.buttons = [
+                [button.callback_data for button in row]
+                for row in reply_markup.inline_keyboard
+            ]
+
+    async def reply_text(self, text, reply_markup=None) -> None:
+        pass
+
+
+class StubUpdate:
+    def __init__(self, data: str) -> None:
+        self.callback_query = StubQuery(data)
+        self.message = None
+
+
+@pytest.fixture
+def bot(import_fresh, monkeypatch):
+    monkeypatch.setattr(config, "RECORDS_PER_PAGE", 10)
+    database = import_fresh("database")
+    with database.SessionLocal() as session:
+        with session.begin():
+            session.add_all(
+                [
+                    database.VoterRecord(
+                        user_id=USER_ID,
+                        transaction_id=f"{i:064x}",
+                        region="moscow",
+                        election=config.CURRENT_ELECTION,
+                    )
+                    for i in range(25)
+                ]
+            )
+    return import_fresh("bot")
+
+
+def _press(handler, data: str) -> StubQuery:
+    update = StubUpdate(data)
+    asyncio.run(handler(update, None))
+    return update.callback_query
+
+
+def _page_range(query: StubQuery) -> str:
+    return query.edited_text.splitlines()[0]
+
+
+def test_pages_are_numbered_in_both_directions(bot):
+    first = _press(bot.list_tx_for_verification, "list_tx_for_verification")
+    assert _page_range(first).endswith("1–10.")
+
+    next_callback = first.buttons[-2][-1]
+    second = _press(bot.list_tx_for_verification, next_callback)
+    assert _page_range(second).endswith("11–20.")
+
+    third = _press(bot.list_tx_for_verification, second.buttons[-2][-1])
+    assert _page_range(third).endswith("21–25.")
+
+    prev_callback = third.buttons[-2][0]
+    assert _page_range(
+        _press(bot.list_tx_for_verification, prev_callback)
+    ).endswith("11–20.")
+
+
+def test_rejected_deletion_returns_to_the_same_page(bot):
+    first = _press(bot.list_tx_for_verification, "list_tx_for_verification")
+    second = _press(bot.list_tx_for_verification, first.buttons[-2][-1])
+
+    # Third row of delete buttons holds #17, #18 and #19.
+    delete_callback = second.buttons[2][1]
+    confirmation = _press(bot.remove_tx_request_confirmation, delete_callback)
+    assert "Транзакция #18" in confirmation.edited_text
+
+    back_callback = confirmation.buttons[0][1]
+    back = _press(bot.list_tx_for_verification, back_callback)
+    assert _page_range(back).endswith("11–20.")
+    assert back.buttons == second.buttons
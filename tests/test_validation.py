@@ -0,0 +1,74 @@
+import pytest
+
+import validation
+
+MOSCOW_SID = "0123456789abcdef" * 4
+FEDERAL_TRANSACTION_ID = "3N1mKpvHJtPq6Uq8ce4ZQ3MiHLxrbgWKsnC6JMGAVnSh"
+FEDERAL_VOTER_KEY = "4EcSxUkMxqxBEBUBL2oKz3ARVsbyRJTivWpNrYQGdguz"
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        MOSCOW_SID,
+        f"  {MOSCOW_SID}\n",
+        f"{MOSCOW_SID[:32]} {MOSCOW_SID[32:]}",
+        f"0x{MOSCOW_SID}",
+        f"0X{MOSCOW_SID.upper()}",
+        MOSCOW_SID.upper(),
+    ],
+)
+def test_moscow_sid_is_normalized(raw):
+    assert validation.normalize_moscow_sid(raw) == MOSCOW_SID
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "",
+        MOSCOW_SID[:-1],
+        MOSCOW_SID + "0",
+        MOSCOW_SID[:-1] + "g",
+        "0x",
+        " " * 600 + MOSCOW_SID,
+    ],
+)
+def test_malformed_moscow_sid_is_rejected(raw):
+    assert validation.normalize_moscow_sid(raw) is None
+
+
+@pytest.mark.parametrize(
+    "normalize, value",
+    [
+        (validation.normalize_other_transaction_id, FEDERAL_TRANSACTION_ID),
+        (validation.normalize_other_voter_key, FEDERAL_VOTER_KEY),
+    ],
+)
+def test_federal_value_keeps_case_and_drops_padding(normalize, value):
+    assert normalize(value) == value
+    assert normalize(f"\t{value[:20]} {value[20:]}  \n") == value
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "",
+        FEDERAL_TRANSACTION_ID[:31],
+        FEDERAL_TRANSACTION_ID + "a",
+        # 0, O, I and l are not part of the base58 alphabet.
+        "0" + FEDERAL_TRANSACTION_ID[1:],
+        "O" + FEDERAL_TRANSACTION_ID[1:],
+        "l" + FEDERAL_TRANSACTION_ID[1:],
+        f"0x{FEDERAL_TRANSACTION_ID[2:]}",
+        "a" * 600,
+    ],
+)
+def test_malformed_federal_transaction_id_is_rejected(raw):
+    assert validation.normalize_other_transaction_id(raw) is None
+
+
+def test_federal_voter_key_length_limits():
+    assert validation.normalize_other_voter_key("a" * 31) is None
+    assert validation.normalize_other_voter_key("a" * 32) == "a" * 32
+    assert validation.normalize_other_voter_key("a" * 88) == "a" * 88
+    assert validation.normalize_other_voter_key("a" * 89) is None
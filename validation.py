@@ -0,0 +1,51 @@
+import re
+
+
+# Moscow transaction ids are hex encoded hashes.
+MOSCOW_SID_RE = re.compile(r"[0-9a-f]{64}")
+
+# The federal system runs on Waves Enterprise, where transaction ids (32 byte
+# hashes) and public keys (32 or 64 bytes) are base58 encoded. Base58 is case
+# sensitive and has no 0, O, I and l.
+_BASE58 = "[1-9A-HJ-NP-Za-km-z]"
+OTHER_TRANSACTION_ID_RE = re.compile(rf"{_BASE58}{{32,44}}")
+OTHER_VOTER_KEY_RE = re.compile(rf"{_BASE58}{{32,88}}")
+
+# Longer than any valid value even with a prefix and generous padding.
+_MAX_RAW_LENGTH = 512
+
+
+def _strip(raw: str) -> str | None:
+    if len(raw) > _MAX_RAW_LENGTH:
+        return None
+    # Users paste ids from screenshots and web pages, so any whitespace is noise.
+    return "".join(raw.split())
+
+
+def _normalize_hex(raw: str, pattern: re.Pattern[str]) -> str | None:
+    value = _strip(raw)
+    if value is None:
+        return None
+    value = value.lower().removeprefix("0x")
+    if pattern.fullmatch(value) is None:
+        return None
+    return value
+
+
+def _normalize_base58(raw: str, pattern: re.Pattern[str]) -> str | None:
+    value = _strip(raw)
+    if value is None or pattern.fullmatch(value) is None:
+        return None
+    return value
+
+
+def normalize_moscow_sid(raw: str) -> str | None:
+    return _normalize_hex(raw, MOSCOW_SID_RE)
+
+
+def normalize_other_transaction_id(raw: str) -> str | None:
+    return _normalize_base58(raw, OTHER_TRANSACTION_ID_RE)
+
+
+def normalize_other_voter_key(raw: str) -> str | None:
+    return _normalize_base58(raw, OTHER_VOTER_KEY_RE)